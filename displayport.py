@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List
 
 # MSP_DISPLAYPORT (0xB6) subcommands
 DP_HEARTBEAT    = 0x00
@@ -18,6 +17,9 @@ def _safe_ascii(b: int) -> str:
     # для отладки показываем точку
     return "·"
 
+# та же подстановка таблицей на все 256 байт: одна bytes.translate на строку
+_SAFE_ASCII_TABLE = "".join(_safe_ascii(b) for b in range(256)).encode("latin-1")
+
 @dataclass
 class Canvas:
     cols: int = 60
@@ -29,7 +31,10 @@ class Canvas:
         self.dirty = True
 
     def clear(self):
-        self.grid: List[List[str]] = [[" " for _ in range(self.cols)] for _ in range(self.rows)]
+        # один непрерывный буфер rows*cols, байт на клетку (latin-1 для TUI)
+        self.grid: bytearray = bytearray(b" " * (self.cols * self.rows))
+        # строки, изменённые с последней отрисовки
+        self.dirty_rows = bytearray(b"\x01" * self.rows)
         self.dirty = True
 
     def write_string(self, row: int, col: int, data: bytes):
@@ -46,13 +51,11 @@ class Canvas:
         if b"\x00" in sbytes:
             sbytes = sbytes.split(b"\x00", 1)[0]
 
-        x = col
-        for b in sbytes:
-            if x >= self.cols:
-                break
-            self.grid[row][x] = _safe_ascii(b)
-            x += 1
+        n = min(len(sbytes), self.cols - col)
+        start = row * self.cols + col
+        self.grid[start:start + n] = sbytes[:n].translate(_SAFE_ASCII_TABLE)
 
+        self.dirty_rows[row] = 1
         self.dirty = True
 
     def draw(self):
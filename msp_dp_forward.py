@@ -18,41 +18,70 @@ def msp_v1(cmd: int, payload: bytes = b"") -> bytes:
         chk ^= b
     return hdr + bytes([ln, cmd]) + payload + bytes([chk])
 
-def read_one_msp_reply(ser: serial.Serial, timeout_s: float = 0.5) -> bytes | None:
-    end = time.time() + timeout_s
-    buf = bytearray()
+class MSPReplyReader:
+    # Serial bytes are appended to one buffer and consumed by advancing a
+    # cursor; the consumed prefix is only dropped once it passes COMPACT_AT,
+    # so framing never re-scans or shifts the buffer per reply.
+    COMPACT_AT = 4096
 
-    while time.time() < end:
-        b = ser.read(1)
-        if not b:
-            continue
-        buf += b
+    def __init__(self, ser: serial.Serial):
+        self.ser = ser
+        self._rxbuf = bytearray()
+        self._cursor = 0
+
+    def reset(self):
+        self._rxbuf.clear()
+        self._cursor = 0
+
+    def _next_frame(self) -> bytes | None:
+        buf = self._rxbuf
 
         # Look for "$M>"
-        if len(buf) >= 3 and buf[-3:] == b"$M>":
-            ln_b = ser.read(1)
-            cmd_b = ser.read(1)
-            if not ln_b or not cmd_b:
-                return None
-            ln = ln_b[0]
-            payload = ser.read(ln)
-            csum = ser.read(1)
-            if not csum:
-                return None
-            return b"$M>" + ln_b + cmd_b + payload + csum
+        idx = buf.find(b"$M>", self._cursor)
+        if idx < 0:
+            # The last two bytes may still be the start of a header
+            self._cursor = max(self._cursor, len(buf) - 2)
+            return None
+
+        self._cursor = idx
+        if len(buf) < idx + 4:
+            return None
+        need = idx + 3 + 1 + 1 + buf[idx + 3] + 1
+        if len(buf) < need:
+            return None
+
+        self._cursor = need
+        return bytes(buf[idx:need])
 
-        # Prevent runaway buffer growth on noise
-        if len(buf) > 4096:
-            buf = buf[-64:]
+    def read_reply(self, timeout_s: float = 0.5) -> bytes | None:
+        end = time.time() + timeout_s
+
+        while True:
+            rep = self._next_frame()
+            if rep is not None:
+                return rep
+
+            # Prevent runaway buffer growth on noise
+            if self._cursor > self.COMPACT_AT:
+                del self._rxbuf[:self._cursor]
+                self._cursor = 0
+
+            if time.time() >= end:
+                return None
 
-    return None
+            # Drain whatever the driver already has instead of one byte per call
+            chunk = self.ser.read(max(1, self.ser.in_waiting))
+            if chunk:
+                self._rxbuf += chunk
 
-def tx_and_forward(sock, ser, udp_addr, cmd, payload=b"", label=""):
+def tx_and_forward(sock, reader, udp_addr, cmd, payload=b"", label=""):
+    ser = reader.ser
     ser.reset_input_buffer()
+    reader.reset()
     ser.write(msp_v1(cmd, payload))
     ser.flush()
 
-    rep = read_one_msp_reply(ser, timeout_s=0.7)
+    rep = reader.read_reply(timeout_s=0.7)
     if rep:
         sock.sendto(rep, udp_addr)
         print(f"{label} reply {len(rep)} bytes -> UDP")
@@ -70,10 +99,11 @@ def main():
     with serial.Serial(PORT, BAUD, timeout=0.02) as ser:
         ser.reset_input_buffer()
         ser.reset_output_buffer()
+        reader = MSPReplyReader(ser)
 
         # Prove MSP link and generate UDP right away
-        tx_and_forward(sock, ser, udp_addr, 0x01, b"", "API_VERSION")
-        tx_and_forward(sock, ser, udp_addr, 0x03, b"", "FC_VERSION")
+        tx_and_forward(sock, reader, udp_addr, 0x01, b"", "API_VERSION")
+        tx_and_forward(sock, reader, udp_addr, 0x03, b"", "FC_VERSION")
 
         # DisplayPort probing/polling candidates (BF versions differ)
         dp_candidates = [
@@ -94,7 +124,7 @@ def main():
             t0 = time.time()
             got = 0
             while time.time() - t0 < 0.05:
-                rep = read_one_msp_reply(ser, timeout_s=0.05)
+                rep = reader.read_reply(timeout_s=0.05)
                 if rep:
                     sock.sendto(rep, udp_addr)
                     got += 1
@@ -2,22 +2,27 @@
 from __future__ import annotations
 
 import argparse
+import copy
+import queue
+import select
 import socket
+import sys
+import threading
 import time
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
 from displayport import (
     DP_CLEAR_SCREEN,
     DP_DRAW_SCREEN,
-    DP_HEARTBEAT,
     DP_RELEASE,
     DP_WRITE_STRING,
 )
-from msp_proto import parse_msp_v1
+from msp_proto import RX_SOCKET_BUFFER, recv_burst
 
 MSP_DISPLAYPORT = 0xB6
 
@@ -28,13 +33,14 @@ class MSPDPCanvas:
     rows: int = 22
     frame: int = 0
     dirty: bool = True
-    grid: list[list[Any]] = field(default_factory=list)
+    # Glyph codes, one byte per cell, row-major (rows * cols).
+    grid: bytearray = field(default_factory=bytearray)
 
     def __post_init__(self) -> None:
         self.clear()
 
     def clear(self) -> None:
-        self.grid = [[" " for _ in range(self.cols)] for _ in range(self.rows)]
+        self.grid[:] = b" " * (self.cols * self.rows)
         self.dirty = True
 
     def write_string(self, row: int, col: int, data: bytes) -> None:
@@ -48,12 +54,9 @@ class MSPDPCanvas:
         if b"\x00" in payload:
             payload = payload.split(b"\x00", 1)[0]
 
-        x = col
-        for value in payload:
-            if x >= self.cols:
-                break
-            self.grid[row][x] = value
-            x += 1
+        n = min(len(payload), self.cols - col)
+        start = row * self.cols + col
+        self.grid[start:start + n] = payload[:n]
 
         self.dirty = True
 
@@ -61,6 +64,13 @@ class MSPDPCanvas:
         self.frame += 1
         self.dirty = True
 
+    def snapshot(self) -> MSPDPCanvas:
+        # Hand a copy of the current grid over to the render thread.
+        snap = copy.copy(self)
+        snap.grid = bytearray(self.grid)
+        self.dirty = False
+        return snap
+
 
 class OSDRenderer:
     def __init__(
@@ -70,11 +80,19 @@ class OSDRenderer:
         cols: int,
         rows: int,
         charset_path: str | None,
+        image_format: str = "png",
+        compress_level: int = 1,
     ) -> None:
         self.width = width
         self.height = height
         self.cols = cols
         self.rows = rows
+        # The temp file suffix does not tell PIL the format, so pass it explicitly.
+        # PNG defaults to zlib level 6, far too slow for a realtime overlay;
+        # TGA is uncompressed RGBA and keeps the alpha channel (PPM/BMP do not).
+        self._save_params: dict[str, Any] = {"format": image_format.upper()}
+        if self._save_params["format"] == "PNG":
+            self._save_params.update(compress_level=compress_level, optimize=False)
 
         # Overlay output size is always video size (pixel-perfect compositor input).
         self.cell_width = max(1, width // cols)
@@ -86,9 +104,23 @@ class OSDRenderer:
         self.tile_height = 0
         self.tiles_per_row = 0
         self.tiles_per_col = 0
+        # One pre-rendered RGBA tile per glyph code, (256, cell_h, cell_w, 4).
+        self._atlas = np.zeros(
+            (256, self.cell_height, self.cell_width, 4), dtype=np.uint8
+        )
 
         if charset_path:
             self._load_charset(Path(charset_path))
+        else:
+            self._bake_text_tiles()
+        # Blank cells stay fully transparent.
+        self._atlas[0x20] = 0
+
+        # Kept across frames; only rows that differ from _last_grid are redrawn.
+        self._frame = np.zeros((height, width, 4), dtype=np.uint8)
+        # Grid contents of the last written frame; the only record of what
+        # _frame shows, used for both the row diff and the unchanged-frame skip.
+        self._last_grid: bytes | None = None
 
     def _load_charset(self, charset_path: Path) -> None:
         charset = Image.open(charset_path).convert("RGBA")
@@ -112,74 +144,108 @@ class OSDRenderer:
             )
 
         self.charset = charset
+        for glyph in range(256):
+            self._atlas[glyph] = np.asarray(self._bake_tile(charset, glyph))
 
-    def _glyph_from_charset(self, value: int) -> Image.Image | None:
-        if self.charset is None:
-            return None
-
-        glyph = value & 0xFF
+    def _bake_tile(self, charset: Image.Image, glyph: int) -> Image.Image:
         tile_x = (glyph % self.tiles_per_row) * self.tile_width
         tile_y = (glyph // self.tiles_per_row) * self.tile_height
 
-        if tile_y + self.tile_height > self.charset.height:
-            return None
-
-        return self.charset.crop(
+        tile = charset.crop(
             (tile_x, tile_y, tile_x + self.tile_width, tile_y + self.tile_height)
         )
-
-    @staticmethod
-    def _value_to_text(value: Any) -> str:
-        if isinstance(value, int):
-            if 32 <= value <= 126:
-                return chr(value)
-            return " "
-        if isinstance(value, str) and value:
-            char = value[0]
-            return char if char.isprintable() else " "
-        return " "
-
-    @staticmethod
-    def _save_atomic(image: Image.Image, output_path: Path) -> None:
+        if tile.size != (self.cell_width, self.cell_height):
+            tile = tile.resize(
+                (self.cell_width, self.cell_height),
+                Image.Resampling.NEAREST,
+            )
+        # Composite over transparency, as drawing onto the empty overlay would.
+        blank = Image.new("RGBA", tile.size, (0, 0, 0, 0))
+        return Image.alpha_composite(blank, tile)
+
+    def _bake_text_tiles(self) -> None:
+        # Without a charset, printable ASCII is drawn with the default font.
+        for glyph in range(33, 127):
+            tile = Image.new("RGBA", (self.cell_width, self.cell_height), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(tile)
+            text = chr(glyph)
+
+            bbox = draw.textbbox((0, 0), text, font=self.font)
+            text_w = bbox[2] - bbox[0]
+            text_h = bbox[3] - bbox[1]
+            text_x = max(0, (self.cell_width - text_w) // 2)
+            text_y = max(0, (self.cell_height - text_h) // 2)
+            draw.text((text_x, text_y), text, fill=(255, 255, 255, 255), font=self.font)
+
+            self._atlas[glyph] = np.asarray(tile)
+
+    def _save_atomic(self, image: Image.Image, output_path: Path) -> None:
         output_path.parent.mkdir(parents=True, exist_ok=True)
         tmp_path = output_path.with_suffix(output_path.suffix + ".tmp")
-        image.save(tmp_path)
+        image.save(tmp_path, **self._save_params)
         tmp_path.replace(output_path)
 
     def render(self, canvas: MSPDPCanvas, output_path: Path) -> None:
-        image = Image.new("RGBA", (self.width, self.height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(image)
-
-        for row in range(self.rows):
-            for col in range(self.cols):
-                x = col * self.cell_width
-                y = row * self.cell_height
-                cell_value = canvas.grid[row][col]
-
-                glyph_index = cell_value if isinstance(cell_value, int) else None
-                if glyph_index is not None:
-                    glyph = self._glyph_from_charset(glyph_index)
-                    if glyph is not None:
-                        if glyph.size != (self.cell_width, self.cell_height):
-                            glyph = glyph.resize(
-                                (self.cell_width, self.cell_height),
-                                Image.Resampling.NEAREST,
-                            )
-                        image.alpha_composite(glyph, dest=(x, y))
-                        continue
-
-                text = self._value_to_text(cell_value)
-                if text == " ":
-                    continue
-
-                bbox = draw.textbbox((0, 0), text, font=self.font)
-                text_w = bbox[2] - bbox[0]
-                text_h = bbox[3] - bbox[1]
-                text_x = x + max(0, (self.cell_width - text_w) // 2)
-                text_y = y + max(0, (self.cell_height - text_h) // 2)
-                draw.text((text_x, text_y), text, fill=(255, 255, 255, 255), font=self.font)
-
-        self._save_atomic(image, output_path)
+        grid = np.frombuffer(canvas.grid, dtype=np.uint8).reshape(self.rows, self.cols)
+        # Rows are diffed against what _frame actually shows, so a snapshot
+        # dropped from the render queue can never leave a row stale. Betaflight
+        # repaints identical OSD content most frames: with no changed row the
+        # PNG encode and disk write are skipped.
+        if self._last_grid is None:
+            dirty_rows = np.arange(self.rows)
+        else:
+            last = np.frombuffer(self._last_grid, dtype=np.uint8).reshape(self.rows, self.cols)
+            dirty_rows = np.flatnonzero((grid != last).any(axis=1))
+        if not dirty_rows.size:
+            return
+
+        ch = self.cell_height
+        cw = self.cell_width
+
+        # Gather tiles for every dirty cell at once: (n, cols, ch, cw, 4),
+        # then lay each row out as a (ch, cols * cw) pixel strip.
+        strips = self._atlas[grid[dirty_rows]]
+        strips = strips.transpose(0, 2, 1, 3, 4).reshape(dirty_rows.size, ch, self.cols * cw, 4)
+
+        cells = self._frame[: self.rows * ch].reshape(self.rows, ch, self.width, 4)
+        cells[dirty_rows, :, : self.cols * cw] = strips
+
+        self._save_atomic(Image.fromarray(self._frame), output_path)
+        self._last_grid = bytes(canvas.grid)
+
+
+def _ignore(payload: bytes) -> None:
+    pass
+
+
+def _put_latest(snapshots: queue.Queue[MSPDPCanvas], snap: MSPDPCanvas) -> None:
+    # Never block the receive loop: replace the oldest pending frame instead.
+    # Nothing is lost by dropping it, render diffs against the last written grid.
+    try:
+        snapshots.put_nowait(snap)
+        return
+    except queue.Full:
+        pass
+    try:
+        snapshots.get_nowait()
+    except queue.Empty:
+        pass
+    snapshots.put_nowait(snap)
+
+
+def _render_worker(
+    renderer: OSDRenderer,
+    snapshots: queue.Queue[MSPDPCanvas],
+    output_path: Path,
+    errors: list[Exception],
+) -> None:
+    # A failed render stops the worker; run() re-raises the error so the
+    # program exits instead of receiving forever without writing frames.
+    try:
+        while True:
+            renderer.render(snapshots.get(), output_path)
+    except Exception as exc:
+        errors.append(exc)
 
 
 def run(
@@ -192,10 +258,14 @@ def run(
     fps: float,
     out: str,
     charset: str | None,
+    image_format: str = "png",
+    compress_level: int = 1,
 ) -> None:
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RX_SOCKET_BUFFER)
     sock.bind((bind, port))
-    sock.settimeout(0.2)
+    sock.setblocking(False)
+    rxbuf = memoryview(bytearray(4096))
 
     canvas = MSPDPCanvas(cols=cols, rows=rows)
     renderer = OSDRenderer(
@@ -204,42 +274,61 @@ def run(
         cols=cols,
         rows=rows,
         charset_path=charset,
+        image_format=image_format,
+        compress_level=compress_level,
     )
 
     min_frame_dt = 1.0 / max(1.0, fps)
     last_write_ts = 0.0
     output_path = Path(out)
 
+    # PNG encoding runs off the receive thread so bursts are not dropped meanwhile.
+    snapshots: queue.Queue[MSPDPCanvas] = queue.Queue(maxsize=2)
+    render_errors: list[Exception] = []
+    threading.Thread(
+        target=_render_worker,
+        args=(renderer, snapshots, output_path, render_errors),
+        daemon=True,
+    ).start()
+
+    def clear_screen(payload: bytes) -> None:
+        canvas.clear()
+
+    def write_string(payload: bytes) -> None:
+        if len(payload) >= 4:
+            row = payload[1]
+            col = payload[2]
+            rest = payload[3:]
+            canvas.write_string(row, col, rest)
+
+    def draw_screen(payload: bytes) -> None:
+        nonlocal last_write_ts
+        canvas.draw()
+        now = time.time()
+        if canvas.dirty and (now - last_write_ts) >= min_frame_dt:
+            _put_latest(snapshots, canvas.snapshot())
+            last_write_ts = now
+
+    # DisplayPort subcommand -> handler, indexed by the first payload byte.
+    handlers = [_ignore] * 256
+    handlers[DP_RELEASE] = clear_screen
+    handlers[DP_CLEAR_SCREEN] = clear_screen
+    handlers[DP_WRITE_STRING] = write_string
+    handlers[DP_DRAW_SCREEN] = draw_screen
+
     while True:
-        try:
-            data, _ = sock.recvfrom(4096)
-        except socket.timeout:
-            continue
+        if render_errors:
+            raise render_errors[0]
 
-        frame = parse_msp_v1(data)
-        if not frame or not frame.csum_ok or frame.cmd != MSP_DISPLAYPORT or not frame.payload:
+        readable, _, _ = select.select([sock], [], [], 0.2)
+        if not readable:
             continue
 
-        sub = frame.payload[0]
+        for frame in recv_burst(sock, rxbuf):
+            if not frame or not frame.csum_ok or frame.cmd != MSP_DISPLAYPORT or not frame.payload:
+                continue
 
-        if sub == DP_HEARTBEAT:
-            continue
-        if sub in (DP_RELEASE, DP_CLEAR_SCREEN):
-            canvas.clear()
-            continue
-        if sub == DP_WRITE_STRING and len(frame.payload) >= 4:
-            row = frame.payload[1]
-            col = frame.payload[2]
-            rest = frame.payload[3:]
-            canvas.write_string(row, col, rest)
-            continue
-        if sub == DP_DRAW_SCREEN:
-            canvas.draw()
-            now = time.time()
-            if canvas.dirty and (now - last_write_ts) >= min_frame_dt:
-                renderer.render(canvas, output_path)
-                canvas.dirty = False
-                last_write_ts = now
+            handlers[frame.payload[0]](frame.payload)
 
 
 def main() -> None:
@@ -252,12 +341,19 @@ def main() -> None:
     parser.add_argument("--height", type=int, default=576)
     parser.add_argument("--charset", default=None)
     parser.add_argument("--fps", type=float, default=20.0)
-    parser.add_argument("--out", default="osd.png")
+    parser.add_argument("--out", default=None, help="default: osd.<format>")
+    parser.add_argument("--format", choices=("png", "tga"), default="png")
+    parser.add_argument("--compress-level", type=int, choices=range(10), default=1)
     # Backward-compatible alias.
     parser.add_argument("--output", dest="out_compat", default=None)
     args = parser.parse_args()
 
-    out_path = args.out_compat or args.out
+    out_path = args.out_compat or args.out or f"osd.{args.format}"
+    if Path(out_path).suffix.lower() != f".{args.format}":
+        print(
+            f"warning: writing {args.format.upper()} data to {out_path}",
+            file=sys.stderr,
+        )
 
     run(
         bind=args.bind,
@@ -269,6 +365,8 @@ def main() -> None:
         fps=args.fps,
         out=out_path,
         charset=args.charset,
+        image_format=args.format,
+        compress_level=args.compress_level,
     )
 
 
@@ -3,10 +3,12 @@ from __future__ import annotations
 
 import argparse
 import curses
+import selectors
 import socket
+import sys
 import time
 
-from msp_proto import parse_msp_v1
+from msp_proto import RX_SOCKET_BUFFER, recv_burst
 from displayport import (
     Canvas,
     DP_HEARTBEAT, DP_RELEASE, DP_CLEAR_SCREEN, DP_WRITE_STRING, DP_DRAW_SCREEN
@@ -14,13 +16,18 @@ from displayport import (
 
 MSP_DISPLAYPORT = 0xB6
 
+def _ignore(payload: bytes):
+    pass
+
 def run(stdscr, bind: str, port: int, cols: int, rows: int):
     stdscr.nodelay(True)
     curses.curs_set(0)
 
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RX_SOCKET_BUFFER)
     s.bind((bind, port))
-    s.settimeout(0.2)
+    s.setblocking(False)
+    rxbuf = memoryview(bytearray(4096))
 
     canvas = Canvas(cols=cols, rows=rows)
 
@@ -38,73 +45,93 @@ def run(stdscr, bind: str, port: int, cols: int, rows: int):
         last_render = now
         canvas.dirty = False
 
-        # заголовок
-        stdscr.erase()
+        # заголовок (без erase: окно хранит прошлый кадр, затираем только хвост строки)
         hdr = f"MSP DisplayPort TUI  udp://{bind}:{port}  size={cols}x{rows}  frame={canvas.frame}  pkts={pkts} bad={bad}"
         stdscr.addstr(0, 0, hdr[:max(0, cols-1)])
+        stdscr.clrtoeol()
 
-        # экран
+        # экран: весь буфер декодируем один раз, перерисовываем только изменённые строки
+        screen = canvas.grid.decode("latin-1")
         for r in range(rows):
-            line = "".join(canvas.grid[r])
-            stdscr.addstr(1 + r, 0, line[:cols])
+            if canvas.dirty_rows[r]:
+                stdscr.addstr(1 + r, 0, screen[r * cols:(r + 1) * cols])
+        canvas.dirty_rows[:] = bytes(rows)
 
         # статусная строка
         info = f"HB:{dp_counts[DP_HEARTBEAT]} CLR:{dp_counts[DP_CLEAR_SCREEN]} WSTR:{dp_counts[DP_WRITE_STRING]} DRAW:{dp_counts[DP_DRAW_SCREEN]}  (q=quit)"
         stdscr.addstr(1 + rows, 0, info[:max(0, cols-1)])
+        stdscr.clrtoeol()
 
         stdscr.refresh()
 
-    while True:
-        # клавиши
-        ch = stdscr.getch()
-        if ch in (ord('q'), ord('Q')):
-            break
+    def clear_screen(payload: bytes):
+        canvas.clear()
+
+    def write_string(payload: bytes):
+        # payload: sub, row, col, attr, string...
+        if len(payload) >= 4:
+            row = payload[1]
+            col = payload[2]
+            rest = payload[3:]  # attr + string...
+            canvas.write_string(row, col, rest)
+
+    def draw_screen(payload: bytes):
+        canvas.draw()
+        # обычно это "commit" — можно рендерить сразу
+        render(force=True)
+
+    # таблица обработчиков по сабкоманде (первый байт payload), строится один раз;
+    # HEARTBEAT и неизвестные — ничего не делаем
+    handlers = [_ignore] * 256
+    handlers[DP_RELEASE] = clear_screen
+    handlers[DP_CLEAR_SCREEN] = clear_screen
+    handlers[DP_WRITE_STRING] = write_string
+    handlers[DP_DRAW_SCREEN] = draw_screen
+
+    # ждём сразу сокет и клавиатуру: нажатие обрабатывается сразу, без опроса по таймауту
+    sel = selectors.DefaultSelector()
+    sel.register(s, selectors.EVENT_READ)
+    sel.register(sys.stdin, selectors.EVENT_READ)
 
-        try:
-            data, _ = s.recvfrom(4096)
-        except socket.timeout:
+    while True:
+        ready = {key.fileobj for key, _ in sel.select(timeout=1.0)}
+        if not ready:
             render()
             continue
 
-        f = parse_msp_v1(data)
-        if not f:
-            continue
-        if not f.csum_ok:
-            bad += 1
-            continue
-        if f.cmd != MSP_DISPLAYPORT:
-            continue
+        # клавиши
+        if sys.stdin in ready:
+            ch = stdscr.getch()
+            if ch in (ord('q'), ord('Q')):
+                break
 
-        pkts += 1
-        if not f.payload:
+        if s not in ready:
             continue
 
-        sub = f.payload[0]
-        dp_counts[sub] = dp_counts.get(sub, 0) + 1
-
-        if sub == DP_HEARTBEAT:
-            # ничего не делаем
-            pass
-        elif sub == DP_RELEASE:
-            canvas.clear()
-        elif sub == DP_CLEAR_SCREEN:
-            canvas.clear()
-        elif sub == DP_WRITE_STRING:
-            # payload: sub, row, col, attr, string...
-            if len(f.payload) >= 4:
-                row = f.payload[1]
-                col = f.payload[2]
-                rest = f.payload[3:]  # attr + string...
-                canvas.write_string(row, col, rest)
-        elif sub == DP_DRAW_SCREEN:
-            canvas.draw()
-            # обычно это "commit" — можно рендерить сразу
-            render(force=True)
-
-        # раз в секунду обновим даже если DRAW нет
-        if time.time() - last_info > 1.0:
-            last_info = time.time()
-            render()
+        for f in recv_burst(s, rxbuf):
+            if not f:
+                continue
+            if not f.csum_ok:
+                bad += 1
+                continue
+            if f.cmd != MSP_DISPLAYPORT:
+                continue
+
+            pkts += 1
+            if not f.payload:
+                continue
+
+            sub = f.payload[0]
+            dp_counts[sub] = dp_counts.get(sub, 0) + 1
+
+            handlers[sub](f.payload)
+
+            # раз в секунду обновим даже если DRAW нет
+            if time.time() - last_info > 1.0:
+                last_info = time.time()
+                render()
+
+    sel.close()
 
 def main():
     ap = argparse.ArgumentParser()
@@ -1,20 +1,42 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import socket
+from typing import NamedTuple
 
-@dataclass(frozen=True)
-class MSPv1Frame:
+# NamedTuple: built once per received packet, tuple construction is far
+# cheaper than a frozen dataclass __init__.
+class MSPv1Frame(NamedTuple):
     direction: bytes  # b"$M>" / b"$M<" / b"$M!"
     cmd: int
     payload: bytes
     csum_ok: bool
 
-def parse_msp_v1(buf: bytes) -> MSPv1Frame | None:
+# Valid headers keyed by their first three bytes read as a little-endian int,
+# e.g. 0x3E4D24 for b"$M>"; the frame reuses these bytes objects.
+_DIRECTIONS = {d[0] | d[1] << 8 | d[2] << 16: d for d in (b"$M>", b"$M<", b"$M!")}
+
+# parse_msp_v1 XORs shorter payloads with a plain byte loop; the big-int
+# fold only wins above this length (measured crossover ~64-80 B).
+_XOR_FOLD_MIN = 64
+
+def _xor8(data: bytes) -> int:
+    # XOR of all bytes: load them as one big int and fold it in halves,
+    # so the work is log2(len) C-level big-int ops instead of a byte loop.
+    acc = int.from_bytes(data, "little")
+    width = len(data)
+    while width > 1:
+        width = (width + 1) // 2
+        bits = 8 * width
+        acc = (acc >> bits) ^ (acc & ((1 << bits) - 1))
+    return acc
+
+def parse_msp_v1(buf: bytes | memoryview) -> MSPv1Frame | None:
     # MSPv1: $M> len cmd payload csum
+    # buf may be a view of a reused receive buffer: the frame copies out its fields.
     if len(buf) < 6:
         return None
-    direction = buf[0:3]
-    if direction not in (b"$M>", b"$M<", b"$M!"):
+    direction = _DIRECTIONS.get(buf[0] | buf[1] << 8 | buf[2] << 16)
+    if direction is None:
         return None
 
     ln = buf[3]
@@ -23,12 +45,33 @@ def parse_msp_v1(buf: bytes) -> MSPv1Frame | None:
     if len(buf) < need:
         return None
 
-    payload = buf[5:5 + ln]
+    payload = bytes(buf[5:5 + ln])
     csum = buf[5 + ln]
 
-    chk = (ln ^ cmd) & 0xFF
-    for b in payload:
-        chk ^= b
-    ok = (chk & 0xFF) == csum
+    # Inlined: an extra call per packet costs more than the loop itself.
+    chk = ln ^ cmd
+    if ln < _XOR_FOLD_MIN:
+        for b in payload:
+            chk ^= b
+    else:
+        chk ^= _xor8(payload)
+    ok = chk == csum
 
     return MSPv1Frame(direction=direction, cmd=cmd, payload=payload, csum_ok=ok)
+
+# UDP receive side shared by the render and TUI loops.
+RX_SOCKET_BUFFER = 4 << 20
+RX_BURST_MAX = 64
+
+def recv_burst(sock: socket.socket, rxbuf: memoryview) -> list[MSPv1Frame | None]:
+    # Drain every datagram already queued on the non-blocking socket, so a
+    # DisplayPort burst is picked up in one pass instead of one wakeup each.
+    # Datagrams land in the same preallocated buffer and are parsed at once.
+    frames: list[MSPv1Frame | None] = []
+    while len(frames) < RX_BURST_MAX:
+        try:
+            n = sock.recv_into(rxbuf)
+        except BlockingIOError:
+            break
+        frames.append(parse_msp_v1(rxbuf[:n]))
+    return frames